@@ -1,31 +1,202 @@
 # Description: Streamlit app for scheduling events using Google Calendar and LLM API
 
 import streamlit as st
-import json
 import logging
+import orjson
 from datetime import datetime, timedelta
-import pytz
 import os
-from calendar_utils import get_calendar_service, create_calendar_event, list_upcoming_events
-from llm_utils import query_groq, extract_json_from_text
+import re
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from calendar_utils import (
+    clear_service_cache,
+    create_calendar_events_batch,
+    get_calendar_service,
+    list_upcoming_events,
+    refresh_credentials_if_stale,
+)
+from llm_utils import query_groq_stream, json_object_end
+from core import (
+    INCOMPLETE_TIME_MESSAGE,
+    build_api_messages,
+    llm_cache_key,
+    format_event_details,
+    local_reply,
+    parse_llm_response,
+    split_events,
+    validate_event,
+)
 from speech_utils import add_mic_to_chat_input
 
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Setup logging once; Streamlit re-executes this script on every rerun
+if not logging.getLogger().handlers:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Now attempt to import the required modules
-try:
-    from calendar_utils import get_calendar_service, create_calendar_event, list_upcoming_events
-    from llm_utils import query_groq, extract_json_from_text
-    from datetime import datetime, timedelta
-    import pytz
-except ImportError as e:
-    st.error(f"Failed to import required modules: {str(e)}")
-    st.error("Please make sure all dependencies are installed. You may need to restart the app.")
-    logger.error(f"Import error: {str(e)}")
-    st.stop()
+# Chat transcripts are appended here, one JSON message per line
+CHAT_LOG_DIR = Path.home() / ".quickevent"
+# Number of most recent messages kept in memory and shown in the chat
+CHAT_HISTORY_LIMIT = 50
+_SESSION_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Per-session cache of Groq replies
+LLM_CACHE_TTL = 3600  # seconds
+LLM_CACHE_SIZE = 32
+
+# Redraw the streaming reply once per this many chunks
+STREAM_RENDER_EVERY = 4
+
+
+@st.cache_resource
+def _executor() -> ThreadPoolExecutor:
+    """
+    Executor for Calendar writes that run in the background.
+    A single worker, since the Calendar client's HTTP transport is not thread-safe.
+    """
+    return ThreadPoolExecutor(max_workers=1)
+
+
+@st.fragment(run_every=1)
+def _poll_in_flight():
+    """Show progress for background event creation and rerun the app once it finishes."""
+    if any(future.done() for future, _ in st.session_state.get('in_flight', [])):
+        st.rerun()
+    st.info("⏳ Scheduling your event...")
+
+
+def _report_created_events(events: list, future: Future):
+    """Post the outcome of a finished background batch to the chat."""
+    try:
+        results = future.result()
+    except Exception as e:
+        logger.error(f"Background event creation failed: {str(e)}")
+        results = [{"success": False, "error": f"Unexpected error: {str(e)}"}] * len(events)
+    
+    for event_json, result in zip(events, results):
+        if result.get("success"):
+            success_message = "✅ Event created successfully!  \n" + format_event_details(
+                event_json, link=result.get('link'), include_desc=False
+            )
+            
+            # Add assistant response to chat history
+            _add_message("assistant", success_message)
+            
+            # Display success message
+            with st.chat_message("assistant"):
+                st.success("Event scheduled successfully!")
+                st.write(success_message)
+                st.write(f"🔗 [View Event]({result.get('link')})")
+        else:
+            error_message = f"❌ Failed to create event: {result.get('error')}"
+            
+            # Add assistant response to chat history
+            _add_message("assistant", error_message)
+            
+            # Display error message
+            with st.chat_message("assistant"):
+                st.error(error_message)
+
+
+def _chat_log_path() -> Path:
+    """
+    Return the transcript file for this chat. The session id is kept in the URL
+    so reloading the page resumes the same transcript.
+    """
+    session_id = st.query_params.get("session")
+    if not session_id or not _SESSION_ID_RE.match(session_id):
+        session_id = uuid.uuid4().hex
+        st.query_params["session"] = session_id
+    return CHAT_LOG_DIR / f"chat-{session_id}.jsonl"
+
+
+def _load_chat_history(path: Path) -> list:
+    """Read the last CHAT_HISTORY_LIMIT messages from a transcript file."""
+    if not path.exists():
+        return []
+    try:
+        with open(path, "rb") as f:
+            return [orjson.loads(line) for line in deque(f, maxlen=CHAT_HISTORY_LIMIT)]
+    except (OSError, orjson.JSONDecodeError) as e:
+        logger.warning(f"Could not read chat transcript {path}: {str(e)}")
+        return []
+
+
+def _add_message(role: str, content: str):
+    """Append a message to the chat history and to its transcript file."""
+    messages = st.session_state['messages']
+    messages.append({"role": role, "content": content})
+    if len(messages) > CHAT_HISTORY_LIMIT:
+        del messages[0]
+    
+    try:
+        CHAT_LOG_DIR.mkdir(parents=True, exist_ok=True)
+        with open(st.session_state['chat_log_path'], "ab") as f:
+            f.write(orjson.dumps(messages[-1]) + b"\n")
+    except OSError as e:
+        logger.warning(f"Could not write chat transcript: {str(e)}")
+
+
+def _post_assistant_error(message: str):
+    """Record an assistant error in the chat history and display it."""
+    _add_message("assistant", message)
+    with st.chat_message("assistant"):
+        st.error(message)
+
+
+def _stream_groq(messages: list, placeholder) -> dict:
+    """Stream the Groq reply into placeholder and return it in query_groq's response shape."""
+    chunks = []
+    try:
+        for chunk in query_groq_stream(messages):
+            chunks.append(chunk)
+            # Joining and redrawing on every token is quadratic and floods the
+            # browser with deltas, so only do it every few chunks
+            render = len(chunks) % STREAM_RENDER_EVERY == 0
+            if not render and "}" not in chunk:
+                continue
+            text = "".join(chunks)
+            if render:
+                placeholder.code(text, language="json")
+            # Stop reading as soon as the top-level object is complete
+            end = json_object_end(text) if "}" in chunk else None
+            if end is not None:
+                chunks = [text[:end]]
+                break
+    except Exception as e:
+        logger.error(f"Streaming request to Groq failed: {str(e)}")
+        details = getattr(getattr(e, "response", None), "text", None)
+        return {"error": f"An exception occurred: {str(e)}", "details": details or "No additional details available."}
+    finally:
+        placeholder.empty()
+    
+    return {"choices": [{"message": {"content": "".join(chunks)}}]}
+
+
+def _query_llm(key: tuple, api_messages: list, placeholder) -> dict:
+    """
+    Return the Groq response for a prompt, reusing this session's cached reply if present.
+    key comes from llm_cache_key.
+    """
+    cache = st.session_state.setdefault('llm_cache', {})
+    
+    cached = cache.pop(key, None)
+    if cached and time.monotonic() - cached[0] < LLM_CACHE_TTL:
+        cache[key] = cached
+        return cached[1]
+    
+    response = _stream_groq(api_messages, placeholder)
+    # Only cache successful replies so a transient failure is not replayed
+    if "error" not in response:
+        cache[key] = (time.monotonic(), response)
+        if len(cache) > LLM_CACHE_SIZE:
+            # Dicts keep insertion order, so the first key is the oldest entry
+            del cache[next(iter(cache))]
+    return response
+
 
 def main():
     st.title('Calendar Event Scheduler')
@@ -34,16 +205,21 @@ def main():
     # Initialize Google Calendar service
     try:
         calendar_service = get_calendar_service()
+        # The cached service outlives its token; keep it fresh in the background
+        refresh_credentials_if_stale()
         st.sidebar.success("✅ Connected to Google Calendar")
     except Exception as e:
+        clear_service_cache()
         st.sidebar.error(f"Failed to connect to Google Calendar: {str(e)}")
         st.error("Authentication failed. Please check your Google Calendar credentials.")
         st.info("If you're running this locally, make sure to set up the required secrets or environment variables.")
         st.stop()
     
-    # Initialize chat history in session state if it doesn't exist
+    # Initialize chat history in session state if it doesn't exist, resuming
+    # the tail of this chat's transcript after a page reload
     if 'messages' not in st.session_state:
-        st.session_state['messages'] = []
+        st.session_state['chat_log_path'] = _chat_log_path()
+        st.session_state['messages'] = _load_chat_history(st.session_state['chat_log_path'])
     
     # Display chat history
     for message in st.session_state['messages']:
@@ -52,74 +228,54 @@ def main():
         with st.chat_message(role):
             st.write(content)
     
-    # Handle confirmation of pending event (if exists)
-    if 'pending_event' in st.session_state:
-        event_json = st.session_state['pending_event']
-        
-        event_details = f"""
-        📌 **Title:** {event_json.get('summary')}
-        🕒 **When:** {event_json.get('start', {}).get('dateTime')} to {event_json.get('end', {}).get('dateTime')}
-        📍 **Where:** {event_json.get('location', 'No location specified')}
-        📝 **Description:** {event_json.get('description', 'No description')}
-        """
-        
-        if 'attendees' in event_json:
-            attendees_list = ", ".join([attendee.get('email') for attendee in event_json.get('attendees', [])])
-            event_details += f"\n👥 **Attendees:** {attendees_list}"
+    # Report on events being created in the background
+    if st.session_state.get('in_flight'):
+        still_running = []
+        for future, events in st.session_state['in_flight']:
+            if future.done():
+                _report_created_events(events, future)
+            else:
+                still_running.append((future, events))
+        st.session_state['in_flight'] = still_running
+        if still_running:
+            _poll_in_flight()
+    
+    # Handle confirmation of pending events (if any)
+    if 'pending_events' in st.session_state:
+        pending_events = st.session_state['pending_events']
         
         st.subheader("Please confirm the event details:")
-        st.write(event_details)
+        for event_json in pending_events:
+            event_details = format_event_details(event_json)
+            st.write(event_details)
         
         col1, col2 = st.columns(2)
         with col1:
             if st.button("✅ Yes, Schedule It"):
-                with st.spinner("Creating event..."):
-                    result = create_calendar_event(calendar_service, event_json)
-                    
-                    if result.get("success"):
-                        success_message = f"""
-                        ✅ Event created successfully!
-                        
-                        📌 Title: {event_json.get('summary')}
-                        🕒 When: {event_json.get('start', {}).get('dateTime')} to {event_json.get('end', {}).get('dateTime')}
-                        📍 Where: {event_json.get('location', 'No location specified')}
-                        🔗 Calendar Link: {result.get('link')}
-                        """
-                        
-                        # Add assistant response to chat history
-                        st.session_state['messages'].append({"role": "assistant", "content": success_message})
-                        
-                        # Display success message
-                        with st.chat_message("assistant"):
-                            st.success("Event scheduled successfully!")
-                            st.write(success_message)
-                            st.write(f"🔗 [View Event]({result.get('link')})")
-                    else:
-                        error_message = f"❌ Failed to create event: {result.get('error')}"
-                        
-                        # Add assistant response to chat history
-                        st.session_state['messages'].append({"role": "assistant", "content": error_message})
-                        
-                        # Display error message
-                        with st.chat_message("assistant"):
-                            st.error(error_message)
+                # Submit every pending event as one batch in the background and
+                # rerun right away; the results are reported once it finishes
+                future = _executor().submit(create_calendar_events_batch, calendar_service, pending_events)
+                st.session_state.setdefault('in_flight', []).append((future, pending_events))
                 
-                # Clear the pending event after handling
-                del st.session_state['pending_event']
+                # Clear the pending events after handling
+                del st.session_state['pending_events']
+                st.session_state.pop('pending_cache_key', None)
                 st.rerun()
                 
         with col2:
             if st.button("❌ No, Ignore"):
                 # Add rejection message to chat history
                 rejection_message = "❌ Event creation canceled."
-                st.session_state['messages'].append({"role": "assistant", "content": rejection_message})
+                _add_message("assistant", rejection_message)
                 
                 # Display rejection message
                 with st.chat_message("assistant"):
                     st.warning(rejection_message)
                 
-                # Clear the pending event
-                del st.session_state['pending_event']
+                # Clear the pending events, and forget the rejected reply so
+                # asking again goes back to the LLM
+                del st.session_state['pending_events']
+                st.session_state.setdefault('llm_cache', {}).pop(st.session_state.pop('pending_cache_key', None), None)
                 st.rerun()
     
     # Get transcribed text from voice if available
@@ -135,50 +291,35 @@ def main():
         user_prompt = st.chat_input("Tell me about the event you want to schedule...")
     
     # Only process new user input if there's no pending event
-    if user_prompt and 'pending_event' not in st.session_state:
+    if user_prompt and 'pending_events' not in st.session_state:
         # Add user message to chat history
-        st.session_state['messages'].append({"role": "user", "content": user_prompt})
+        _add_message("user", user_prompt)
         
         # Display user message
         with st.chat_message("user"):
             st.write(user_prompt)
         
-        # Get current date and time information for context
-        now = datetime.now()
-        current_date = now.strftime("%Y-%m-%d")
-        current_time = now.strftime("%H:%M:%S")
-        current_timezone = datetime.now(pytz.timezone('UTC')).astimezone().tzinfo
+        # Answer greetings and prompts without any date, time or event words locally
+        reply = local_reply(user_prompt)
+        if reply:
+            _add_message("assistant", reply)
+            with st.chat_message("assistant"):
+                st.write(reply)
+            return
         
-        # Prepare messages for API call with date context
-        api_messages = [
-            {"role": "system", "content": f"""You are a helpful calendar assistant. Today's date is {current_date} and the current time is {current_time} in timezone {current_timezone}.
-
-Extract event details from the user's input and provide them in a valid JSON format that matches Google Calendar's event format. Include the following fields when possible:
-- summary: Event title
-- location: Event location
-- description: Event description
-- start: Object with dateTime (in ISO format with timezone, e.g. "2025-03-15T09:00:00+05:30") and timeZone
-- end: Object with dateTime and timeZone 
-- colorId: A number from 1-11 representing the event color
-- attendees: Array of objects with email addresses
-- recurrence: Array of RRULE strings if the event repeats
-
-When user mentions relative dates like "today", "tomorrow", "next week", etc., convert them to actual dates based on the current date provided above.
-
-Only include fields that are specifically mentioned by the user. Format dates correctly in ISO format with timezone.
-If you cannot determine the date or time information from the user's input, include an "error" field with value "incomplete_time_info" in your JSON response.
-
-Respond only with the JSON object and no additional text."""},
-            {"role": "user", "content": user_prompt}
-        ]
+        # Get current date and time information for context
+        current_date, current_time = datetime.now().isoformat(timespec='seconds').split('T')
+        api_messages = build_api_messages(user_prompt, current_date, current_time)
+        cache_key = llm_cache_key(user_prompt, current_date, current_time)
         
-        # Show a spinner while waiting for the response
+        # Show a spinner and the reply as it streams in
+        placeholder = st.empty()
         with st.spinner("Processing your request..."):
-            response = query_groq(api_messages)
+            response = _query_llm(cache_key, api_messages, placeholder)
         
         if "error" in response:
             error_message = f"Error: {response['error']}"
-            st.session_state['messages'].append({"role": "assistant", "content": error_message})
+            _add_message("assistant", error_message)
             with st.chat_message("assistant"):
                 st.error(error_message)
                 st.text("Debug Details:")
@@ -187,74 +328,32 @@ Respond only with the JSON object and no additional text."""},
             # Extract the JSON content from the response
             assistant_content = response['choices'][0]['message']['content']
             
-            try:
-                # Parse the JSON response
-                event_json = json.loads(assistant_content)
-                
+            event_json, extracted = parse_llm_response(assistant_content)
+            debug_label = "Debug - Extracted JSON" if extracted else "Debug - LLM Response"
+            
+            if event_json:
                 # Debug info in sidebar
-                with st.sidebar.expander("Debug - LLM Response"):
+                with st.sidebar.expander(debug_label):
                     st.json(event_json)
-                
-                # Check if the LLM indicated incomplete time information
-                if event_json.get("error") == "incomplete_time_info":
-                    error_message = "❌ Not able to get the time or details are incomplete. Please provide more specific date and time information."
-                    st.session_state['messages'].append({"role": "assistant", "content": error_message})
-                    with st.chat_message("assistant"):
-                        st.error(error_message)
-                    return
-                
-                # Check if start time is missing
-                if not event_json.get('start', {}).get('dateTime'):
-                    error_message = "❌ Not able to get the time or details are incomplete. Please provide more specific date and time information."
-                    st.session_state['messages'].append({"role": "assistant", "content": error_message})
-                    with st.chat_message("assistant"):
-                        st.error(error_message)
-                    return
-                
-                # Store the event in session state for confirmation
-                st.session_state['pending_event'] = event_json
-                
-                # Rerun to show confirmation buttons
-                st.rerun()
-                
-            except json.JSONDecodeError:
-                # If JSON parsing fails, try to extract JSON from the text
-                extracted_json = extract_json_from_text(assistant_content)
-                
-                if extracted_json:
-                    # Debug info in sidebar
-                    with st.sidebar.expander("Debug - Extracted JSON"):
-                        st.json(extracted_json)
-                    
-                    # Check if the LLM indicated incomplete time information
-                    if extracted_json.get("error") == "incomplete_time_info":
-                        error_message = "❌ Not able to get the time or details are incomplete. Please provide more specific date and time information."
-                        st.session_state['messages'].append({"role": "assistant", "content": error_message})
-                        with st.chat_message("assistant"):
-                            st.error(error_message)
-                        return
-                    
-                    # Check if start time is missing
-                    if not extracted_json.get('start', {}).get('dateTime'):
-                        error_message = "❌ Not able to get the time or details are incomplete. Please provide more specific date and time information."
-                        st.session_state['messages'].append({"role": "assistant", "content": error_message})
-                        with st.chat_message("assistant"):
-                            st.error(error_message)
-                        return
-                    
-                    # Store the event in session state for confirmation
-                    st.session_state['pending_event'] = extracted_json
-                    
-                    # Rerun to show confirmation buttons
-                    st.rerun()
-                else:
-                    error_message = "❌ Not able to get the time or details are incomplete. Please provide more specific date and time information."
-                    st.session_state['messages'].append({"role": "assistant", "content": error_message})
-                    with st.chat_message("assistant"):
-                        st.error(error_message)
+            
+            events = split_events(event_json)
+            if not events or not all(validate_event(event) for event in events):
+                # Don't replay an unusable reply; asking again should reach the LLM
+                st.session_state['llm_cache'].pop(cache_key, None)
+                _post_assistant_error(INCOMPLETE_TIME_MESSAGE)
+                return
+            
+            # Store the events in session state for confirmation; they are
+            # inserted together as one batch request
+            st.session_state['pending_events'] = events
+            st.session_state['pending_cache_key'] = cache_key
+            
+            # Rerun to show confirmation buttons
+            st.rerun()
     
     # Add a button to list upcoming events
-    if st.button("List Upcoming Events"):
+    # Disabled while a background write is using the Calendar client
+    if st.button("List Upcoming Events", disabled=bool(st.session_state.get('in_flight'))):
         with st.spinner("Fetching your upcoming events..."):
             events_result = list_upcoming_events(calendar_service)
             if events_result.get("success"):
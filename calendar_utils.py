@@ -1,34 +1,33 @@
 # calendar_utils.py
 import os
 import datetime as dt
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import re
-from typing import Dict, List, Any, Optional
-import json
 import time
+import uuid
+import weakref
+from typing import Dict, List, Any, Optional
+import orjson
 import pickle
 import streamlit as st
-import logging
 
-# Set up logging
+# Logging is configured by the app; this module only emits
 logger = logging.getLogger(__name__)
-# logging.basicConfig(level=logging.INFO)
-# # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-# logger = logging.getLogger(__name__)
 # Suppress the oauth2client warning by setting a specific environment variable
 # This is a temporary fix until migrating fully away from file_cache
 os.environ['OAUTH_SKIP_CACHE_WARNING'] = '1'
 
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from retry_utils import backoff_delay
+
 # Google Calendar API Scope
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
@@ -37,6 +36,39 @@ SCOPES = ['https://www.googleapis.com/auth/calendar']
 DEFAULT_TIMEZONE = "Asia/Kolkata"  # Indian Standard Time (IST)
 DEFAULT_TIMEZONE_OFFSET = "+05:30"  # UTC+5:30 for India
 
+# How list_upcoming_events shows timed and all-day events
+UPCOMING_TIME_FORMAT = '%B %d, %Y at %I:%M %p'
+UPCOMING_DATE_FORMAT = '%B %d, %Y (all day)'
+
+# Retries for rate limits, server errors and dropped connections, with
+# exponential backoff handled by googleapiclient itself
+API_NUM_RETRIES = 3
+
+# The Calendar API accepts at most 50 calls in one batch request
+MAX_BATCH_SIZE = 50
+# Batch requests have no num_retries, so parts failing with these statuses, and
+# batches that fail to send at all, are resubmitted up to API_NUM_RETRIES times,
+# BATCH_RETRY_DELAY apart and doubling
+BATCH_RETRY_STATUSES = (429, 500, 502, 503, 504)
+BATCH_RETRY_DELAY = 1.0  # seconds
+
+# Refresh the access token in the background once it is this close to expiry.
+# Must be larger than google-auth's own refresh threshold (3m45s), past which
+# the token counts as expired and the next API call refreshes it inline.
+TOKEN_REFRESH_MARGIN = dt.timedelta(minutes=10)
+
+# Background token refreshes; one at a time is plenty
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+# Each browser session keeps its own Calendar service in st.session_state, since
+# sessions may hold different tokens and the httplib2 transport is not thread-safe.
+# It is rebuilt after SERVICE_TTL, a little under the token lifetime.
+_SERVICE_STATE_KEY = "calendar_service"
+SERVICE_TTL = 3000  # seconds
+# Services whose credentials stopped working; filled from any thread, and
+# checked on the script thread before a service is reused
+_stale_services = weakref.WeakSet()
+
 
 def get_credentials():
     """
@@ -61,8 +93,8 @@ def get_credentials():
     # 2️⃣ **Use token.json (if exists)**
     elif os.path.exists("token.json"):
         logger.info("Loading credentials from token.json")
-        with open("token.json", "r") as token:
-            creds = Credentials.from_authorized_user_info(json.load(token), SCOPES)
+        with open("token.json", "rb") as token:
+            creds = Credentials.from_authorized_user_info(orjson.loads(token.read()), SCOPES)
 
     # If credentials don't exist or are invalid
     if not creds or not creds.valid:
@@ -75,14 +107,14 @@ def get_credentials():
                 # 3️⃣ **Streamlit secrets (recommended for deployment)**
                 if "google_credentials" in st.secrets:
                     logger.info("Loading credentials from Streamlit secrets")
-                    client_config = json.loads(st.secrets["google_credentials"])  # Ensure it's parsed correctly
+                    client_config = orjson.loads(st.secrets["google_credentials"])  # Ensure it's parsed correctly
                     flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
                     creds = flow.run_local_server(port=0)
 
                 # 4️⃣ **Environment variable (alternative approach)**
                 elif "GOOGLE_CREDENTIALS" in os.environ:
                     logger.info("Loading credentials from environment variable")
-                    client_config = json.loads(os.environ["GOOGLE_CREDENTIALS"])
+                    client_config = orjson.loads(os.environ["GOOGLE_CREDENTIALS"])
                     flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
                     creds = flow.run_local_server(port=0)
 
@@ -98,68 +130,191 @@ def get_credentials():
                     raise FileNotFoundError(error_msg)
 
             except Exception as e:
-                logger.error(f"Error during authentication: {str(e)}")
+                logger.error("Error during authentication: %s", e)
                 raise
 
         # Save the credentials for future use
         if creds:
-            st.session_state["token"] = json.loads(creds.to_json())
-            with open("token.json", "w") as token:
-                token.write(creds.to_json())
+            st.session_state["token"] = _save_token(creds)
 
     return creds
 
-def get_calendar_service():
-    """Build and return the Google Calendar API service with retry logic."""
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
+def _save_token(creds) -> Dict:
+    """Write credentials to token.json and return them as a dict."""
+    token_json = creds.to_json()
+    with open("token.json", "w") as token:
+        token.write(token_json)
+    return orjson.loads(token_json)
+
+def _refresh_token(creds) -> Dict:
+    """Refresh credentials in place and persist them; runs on _REFRESH_EXECUTOR."""
+    creds.refresh(Request())
+    logger.info("Refreshed credentials ahead of expiry")
+    return _save_token(creds)
+
+def refresh_credentials_if_stale():
+    """
+    Refresh the live credentials in the background when they are about to expire,
+    so no Calendar call has to wait on Google's token endpoint.
+    Call once per rerun; it also picks up the result of a finished refresh.
+    """
+    entry = st.session_state.get(_SERVICE_STATE_KEY)
+    if entry is None:
+        return
+    refresh = entry["token_refresh"]
+    if refresh is not None and refresh.done():
         try:
-            creds = get_credentials()
-            service = build("calendar", "v3", credentials=creds, cache_discovery=False)
-            return service
+            # Session state is only safe to touch from the script thread
+            st.session_state["token"] = refresh.result()
         except Exception as e:
-            retry_count += 1
-            if retry_count >= max_retries:
-                logging.error(f"Failed to build Calendar service after {max_retries} attempts: {str(e)}")
-                raise
-            else:
-                logging.warning(f"Attempt {retry_count} failed to build Calendar service: {str(e)}. Retrying...")
-                time.sleep(1)  # Wait before retrying
+            logger.warning("Background token refresh failed: %s", e)
+        entry["token_refresh"] = refresh = None
+    
+    creds = entry["credentials"]
+    if refresh is not None or creds is None or not creds.expiry or creds.expired:
+        return
+    # google-auth keeps expiry as a naive UTC datetime
+    if dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) > creds.expiry - TOKEN_REFRESH_MARGIN:
+        entry["token_refresh"] = _REFRESH_EXECUTOR.submit(_refresh_token, creds)
 
-def parse_datetime(datetime_str: str) -> Optional[dt.datetime]:
+def get_calendar_service():
     """
-    Attempts to parse a datetime string in various formats.
-    Returns None if parsing fails.
+    Build and return this session's Google Calendar API service.
+    The service is kept across reruns for SERVICE_TTL; call
+    clear_service_cache() when its credentials stop working.
     """
-    if not datetime_str:
-        return None
+    entry = st.session_state.get(_SERVICE_STATE_KEY)
+    if (
+        entry is not None
+        and time.monotonic() - entry["built_at"] < SERVICE_TTL
+        and entry["service"] not in _stale_services
+    ):
+        return entry["service"]
     
-    formats = [
-        '%Y-%m-%dT%H:%M:%S%z',  # ISO format with timezone
-        '%Y-%m-%dT%H:%M:%S',     # ISO format without timezone
-        '%Y-%m-%d %H:%M:%S',     # Standard datetime format
-        '%Y-%m-%d %H:%M',        # Date with time (no seconds)
-        '%Y-%m-%d',              # Just date
-        '%m/%d/%Y %H:%M:%S',     # US format with time
-        '%m/%d/%Y %H:%M',        # US format with time (no seconds)
-        '%m/%d/%Y',              # US date format
-        '%d/%m/%Y %H:%M:%S',     # European/Indian format with time
-        '%d/%m/%Y %H:%M',        # European/Indian format with time (no seconds)
-        '%d/%m/%Y',              # European/Indian date format
-    ]
+    try:
+        creds = get_credentials()
+        service = build("calendar", "v3", credentials=creds, cache_discovery=False, num_retries=API_NUM_RETRIES)
+    except Exception as e:
+        logger.error("Failed to build Calendar service: %s", e)
+        raise
+    st.session_state[_SERVICE_STATE_KEY] = {
+        "service": service,
+        "credentials": creds,
+        "built_at": time.monotonic(),
+        "token_refresh": None,
+        # Keeps this session's cached event listings apart from other sessions'
+        "cache_key": uuid.uuid4().hex,
+    }
+    refresh_credentials_if_stale()
+    return service
+
+def clear_service_cache(service=None):
+    """
+    Drop a Calendar service so the next get_calendar_service() call re-authenticates.
+    With a service, marks that one stale, which is safe from worker threads;
+    without, drops this session's service, from the script thread only.
+    """
+    if service is not None:
+        _stale_services.add(service)
+    else:
+        st.session_state.pop(_SERVICE_STATE_KEY, None)
+
+def _is_auth_error(error: Exception) -> bool:
+    """Whether an API error means the cached service's credentials are no good."""
+    if isinstance(error, RefreshError):
+        return True
+    return isinstance(error, HttpError) and error.resp.status == 401
+
+def _is_transient_batch_error(error: Exception) -> bool:
+    """
+    Whether a batch, or one part of it, is worth sending again: a rate limit or
+    server error, or a failure to get a response at all, such as a dropped connection.
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status in BATCH_RETRY_STATUSES
+    return not _is_auth_error(error)
+
+# One pattern for every layout parse_datetime accepts:
+#   YYYY-MM-DD, optionally followed by [T ]HH:MM[:SS] and a Z / +HH:MM offset
+#   MM/DD/YYYY or DD/MM/YYYY, optionally followed by " HH:MM[:SS]"
+_DATETIME_RE = re.compile(
+    r'^(?:'
+    r'(?P<Y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})'
+    r'(?:[T ](?P<H>\d{1,2}):(?P<M>\d{1,2})(?::(?P<S>\d{1,2}))?(?P<tz>Z|[+-]\d{2}(?::[0-5]\d(?::[0-5]\d(?:\.\d{1,6})?)?|[0-5]\d(?:[0-5]\d(?:\.\d{1,6})?)?))?)?'
+    r'|(?P<a>\d{1,2})/(?P<b>\d{1,2})/(?P<y>\d{4})'
+    r'(?: (?P<sH>\d{1,2}):(?P<sM>\d{1,2})(?::(?P<sS>\d{1,2}))?)?'
+    r')$'
+)
+# Simple pattern for "March 18, 2025 at 3 PM" or similar
+_NATURAL_DATE_RE = re.compile(r'(\w+ \d{1,2}, \d{4})(?:.+?(\d{1,2}(?::\d{2})? [AP]M))?')
+
+def _tz_from_offset(offset: Optional[str]) -> Optional[dt.tzinfo]:
+    """
+    Converts a 'Z' / '+HH:MM[:SS[.ffffff]]' / '-HHMM[SS]' suffix into a fixed-offset
+    timezone, as strptime's %z does. Raises ValueError for offsets of 24 hours or more.
+    """
+    if offset is None:
+        return None
+    if offset == 'Z':
+        return dt.timezone.utc
+    sign = -1 if offset[0] == '-' else 1
+    digits = offset[1:].replace(':', '')
+    delta = dt.timedelta(
+        hours=int(digits[:2]), minutes=int(digits[2:4]),
+        seconds=int(digits[4:6] or 0), microseconds=int(digits[7:].ljust(6, '0') or 0),
+    )
+    return dt.timezone(sign * delta)
+
+def _match_to_datetime(match: re.Match) -> Optional[dt.datetime]:
+    """Builds a datetime from a _DATETIME_RE match, or None if a field is out of range."""
+    groups = match.groupdict()
+    if groups['Y']:
+        candidates = [(int(groups['Y']), int(groups['m']), int(groups['d']))]
+        hour, minute, second = groups['H'], groups['M'], groups['S']
+    else:
+        first, middle, year = int(groups['a']), int(groups['b']), int(groups['y'])
+        # Month-first before day-first, so 03/04/2025 is March 4 as it always was
+        candidates = [(year, first, middle), (year, middle, first)]
+        hour, minute, second = groups['sH'], groups['sM'], groups['sS']
     
-    for fmt in formats:
+    try:
+        tzinfo = _tz_from_offset(groups['tz'])
+    except ValueError:
+        return None
+    for year, month, day in candidates:
         try:
-            return dt.datetime.strptime(datetime_str, fmt)
+            return dt.datetime(year, month, day, int(hour or 0), int(minute or 0), int(second or 0), tzinfo=tzinfo)
         except ValueError:
             continue
+    return None
+
+def _fast_google_iso(value: str) -> Optional[dt.datetime]:
+    """
+    Parses the canonical YYYY-MM-DD[THH:MM:SS(Z|+HH:MM)] strings the Calendar API
+    returns, or returns None so the caller can fall back to fromisoformat.
+    """
+    match = _DATETIME_RE.match(value)
+    if match and match.group('Y'):
+        return _match_to_datetime(match)
+    return None
+
+def parse_datetime(datetime_str: str) -> Optional[dt.datetime]:
+    """
+    Attempts to parse a datetime string in various formats.
+    Returns None if parsing fails.
+    """
+    return _parse_datetime_cached(datetime_str) if datetime_str else None
+
+@functools.lru_cache(maxsize=1024)
+def _parse_datetime_cached(datetime_str: str) -> Optional[dt.datetime]:
+    """Parses a non-empty datetime string; datetimes are immutable, so results can be shared."""
+    match = _DATETIME_RE.match(datetime_str)
+    if match:
+        return _match_to_datetime(match)
     
     # Try extracting with regex for natural language processing
     try:
-        # Simple pattern for "March 18, 2025 at 3 PM" or similar
-        match = re.search(r'(\w+ \d{1,2}, \d{4})(?:.+?(\d{1,2}(?::\d{2})? [AP]M))?', datetime_str)
+        match = _NATURAL_DATE_RE.search(datetime_str)
         if match:
             date_part = match.group(1)
             time_part = match.group(2) if match.group(2) else "12:00 PM"
@@ -169,10 +324,20 @@ def parse_datetime(datetime_str: str) -> Optional[dt.datetime]:
     
     return None
 
+def _fallback_times(now: dt.datetime) -> Dict[str, str]:
+    """Default IST start and end times used when an event's own can't be parsed: now + 1 hour and now + 2 hours."""
+    return {
+        'start': f"{now + dt.timedelta(hours=1):%Y-%m-%dT%H:%M:%S}{DEFAULT_TIMEZONE_OFFSET}",
+        'end': f"{now + dt.timedelta(hours=2):%Y-%m-%dT%H:%M:%S}{DEFAULT_TIMEZONE_OFFSET}",
+    }
+
 def validate_event_data(event_data: Dict) -> Dict:
-    """Validates and formats event data to ensure it's compatible with Google Calendar API."""
-    # Create a copy to avoid modifying the original
-    validated_event = event_data.copy()
+    """
+    Validates and formats event data to ensure it's compatible with Google Calendar API.
+    The event is updated in place (a shallow copy would share the nested
+    start/end/attendees anyway) and returned along with any parsing errors.
+    """
+    validated_event = event_data
     parsing_errors = []
     
     # Ensure required fields exist
@@ -180,28 +345,21 @@ def validate_event_data(event_data: Dict) -> Dict:
         validated_event['summary'] = "Untitled Event"
     
     # Get current year for validation
-    current_year = dt.datetime.now().year
+    now = dt.datetime.now()
+    current_year = now.year
+    fallback_iso = _fallback_times(now)
     
     # Validate start and end times
     for time_field in ['start', 'end']:
         if time_field not in validated_event:
             # If missing time fields, create with current time + 1 hour for start, + 2 hours for end
-            now = dt.datetime.now()
-            offset = 1 if time_field == 'start' else 2
-            future_time = now + dt.timedelta(hours=offset)
-            iso_time = future_time.strftime('%Y-%m-%dT%H:%M:%S')
-            
-            # Add IST timezone
-            iso_time = iso_time + DEFAULT_TIMEZONE_OFFSET
-                
             validated_event[time_field] = {
-                'dateTime': iso_time,
+                'dateTime': fallback_iso[time_field],
                 'timeZone': DEFAULT_TIMEZONE
             }
         elif isinstance(validated_event[time_field], dict):
             # Ensure timeZone exists
-            if 'timeZone' not in validated_event[time_field]:
-                validated_event[time_field]['timeZone'] = DEFAULT_TIMEZONE
+            validated_event[time_field].setdefault('timeZone', DEFAULT_TIMEZONE)
             
             # Check if dateTime exists and is valid
             if 'dateTime' in validated_event[time_field]:
@@ -215,33 +373,27 @@ def validate_event_data(event_data: Dict) -> Dict:
                         if parsed_dt is None:
                             # If parsing fails, log an error and use default time
                             parsing_errors.append(f"Could not parse {time_field} time: {datetime_str}")
-                            
-                            now = dt.datetime.now()
-                            offset = 1 if time_field == 'start' else 2
-                            future_time = now + dt.timedelta(hours=offset)
-                            validated_event[time_field]['dateTime'] = future_time.strftime('%Y-%m-%dT%H:%M:%S') + DEFAULT_TIMEZONE_OFFSET
+                            validated_event[time_field]['dateTime'] = fallback_iso[time_field]
                         else:
                             # Fix year if it's in the past
                             if parsed_dt.year < current_year:
                                 parsed_dt = parsed_dt.replace(year=current_year)
                             
                             # Format datetime in ISO format with timezone
-                            validated_event[time_field]['dateTime'] = parsed_dt.strftime('%Y-%m-%dT%H:%M:%S') + DEFAULT_TIMEZONE_OFFSET
+                            validated_event[time_field]['dateTime'] = f"{parsed_dt:%Y-%m-%dT%H:%M:%S}{DEFAULT_TIMEZONE_OFFSET}"
                     except Exception as e:
                         parsing_errors.append(f"Error parsing {time_field} time: {str(e)}")
                         
                         # Use default time if parsing fails
-                        now = dt.datetime.now()
-                        offset = 1 if time_field == 'start' else 2
-                        future_time = now + dt.timedelta(hours=offset)
-                        validated_event[time_field]['dateTime'] = future_time.strftime('%Y-%m-%dT%H:%M:%S') + DEFAULT_TIMEZONE_OFFSET
+                        validated_event[time_field]['dateTime'] = fallback_iso[time_field]
     
     # Validate attendees format if present
     if 'attendees' in validated_event and isinstance(validated_event['attendees'], list):
-        for i, attendee in enumerate(validated_event['attendees']):
-            if isinstance(attendee, str):
-                # Convert string emails to proper format
-                validated_event['attendees'][i] = {'email': attendee}
+        # Convert string emails to proper format
+        validated_event['attendees'] = [
+            {'email': attendee} if isinstance(attendee, str) else attendee
+            for attendee in validated_event['attendees']
+        ]
     
     return validated_event, parsing_errors
 
@@ -252,132 +404,198 @@ def create_calendar_event(service, event_data: Dict) -> Dict:
         validated_event, parsing_errors = validate_event_data(event_data)
         
         # Log the event data being sent
-        logging.info(f"Creating event with data: {validated_event}")
+        logger.info("Creating event with data: %s", validated_event)
         
-        # Insert the event with retry logic
-        max_retries = 3
-        retry_count = 0
+        # Insert the event; the client retries rate limits and server errors itself
+        try:
+            event = service.events().insert(calendarId="primary", body=validated_event).execute(num_retries=API_NUM_RETRIES)
+        except HttpError as error:
+            logger.error("Failed to create event: %s", error)
+            if _is_auth_error(error):
+                clear_service_cache(service)
+            return {
+                "success": False,
+                "error": str(error),
+                "warnings": parsing_errors if parsing_errors else None
+            }
         
-        while retry_count < max_retries:
-            try:
-                event = service.events().insert(calendarId="primary", body=validated_event).execute()
-                
-                # Log successful creation
-                logging.info(f"Event created successfully with ID: {event.get('id')}")
-                
-                # Return success result with event link and any parsing errors
-                result = {
-                    "success": True,
-                    "event_id": event.get('id'),
-                    "link": event.get('htmlLink')
-                }
-                
-                if parsing_errors:
-                    result["warnings"] = parsing_errors
-                    result["message"] = "Event created with some time parsing issues. Default times were used."
-                
-                return result
-            
-            except HttpError as error:
-                retry_count += 1
-                if retry_count >= max_retries:
-                    logging.error(f"Failed to create event after {max_retries} attempts: {error}")
-                    return {
-                        "success": False,
-                        "error": str(error),
-                        "warnings": parsing_errors if parsing_errors else None
-                    }
-                else:
-                    logging.warning(f"Attempt {retry_count} failed to create event: {error}. Retrying...")
-                    time.sleep(1)  # Wait before retrying
+        # Log successful creation
+        logger.info("Event created successfully with ID: %s", event.get('id'))
+        _fetch_upcoming_events_raw.clear()
+        
+        # Return success result with event link and any parsing errors
+        return _event_created_result(event, parsing_errors)
     
     except Exception as e:
-        logging.error(f"Unexpected error creating event: {str(e)}")
+        logger.error("Unexpected error creating event: %s", e)
+        if _is_auth_error(e):
+            clear_service_cache(service)
         return {
             "success": False,
             "error": f"Unexpected error: {str(e)}",
             "warnings": parsing_errors if 'parsing_errors' in locals() else None
         }
 
-def list_upcoming_events(service) -> Dict:
-    """Lists the next 10 upcoming events with timeout handling."""
-    now = dt.datetime.utcnow().isoformat() + "Z"
+def create_calendar_events_batch(service, events: List[Dict]) -> List[Dict]:
+    """
+    Creates several events on Google Calendar using batch requests, one HTTP
+    round-trip per MAX_BATCH_SIZE events. Parts that fail with a rate limit or
+    server error are resubmitted with backoff.
+    Returns one result per event, in order, shaped like create_calendar_event's.
+    """
+    validated = [validate_event_data(event_data) for event_data in events]
+    results = [None] * len(events)
+    retry = []
     
-    try:
-        # Set a timeout for the API request
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                events_result = (
-                    service.events()
-                    .list(
-                        calendarId="primary",
-                        timeMin=now,
-                        maxResults=10,
-                        singleEvents=True,
-                        orderBy="startTime",
-                    )
-                    .execute()
-                )
-                
-                events = events_result.get("items", [])
-                events_list = []
-                
-                if not events:
-                    return {"success": True, "events": [], "message": "No upcoming events found."}
-                
-                for event in events:
-                    start = event["start"].get("dateTime", event["start"].get("date"))
-                    try:
-                        # Format the date nicely if possible
-                        if 'T' in start:  # If it includes time
-                            start_dt = dt.datetime.fromisoformat(start.replace('Z', '+00:00'))
-                            formatted_start = start_dt.strftime('%B %d, %Y at %I:%M %p')
-                        else:  # All-day event
-                            start_dt = dt.datetime.fromisoformat(start)
-                            formatted_start = start_dt.strftime('%B %d, %Y (all day)')
-                    except:
-                        formatted_start = start  # Use original if parsing fails
-                        
-                    events_list.append(f"🕒 {formatted_start} - {event['summary']}")
-                
-                return {"success": True, "events": events_list}
-            
-            except HttpError as error:
-                if "timed out" in str(error).lower():
-                    retry_count += 1
-                    if retry_count >= max_retries:
-                        logging.error(f"Request timed out after {max_retries} attempts")
-                        return {
-                            "success": False, 
-                            "error": "The request to fetch calendar events timed out. Please try again later."
-                        }
-                    else:
-                        logging.warning(f"Attempt {retry_count} timed out. Retrying...")
-                        time.sleep(2)  # Increase wait time before retrying
-                else:
-                    logging.error(f"HTTP error while fetching events: {error}")
-                    return {"success": False, "error": str(error)}
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        parsing_errors = validated[index][1]
+        if attempt < API_NUM_RETRIES and isinstance(exception, HttpError) and _is_transient_batch_error(exception):
+            logger.warning("Transient error creating event %s in batch, retrying: %s", index, exception)
+            retry.append(index)
+        elif exception is not None:
+            logger.error("Failed to create event %s in batch: %s", index, exception)
+            if _is_auth_error(exception):
+                clear_service_cache(service)
+            results[index] = {
+                "success": False,
+                "error": str(exception),
+                "warnings": parsing_errors if parsing_errors else None
+            }
+        else:
+            logger.info("Event created successfully with ID: %s", response.get('id'))
+            results[index] = _event_created_result(response, parsing_errors)
+    
+    pending = list(range(len(validated)))
+    for attempt in range(API_NUM_RETRIES + 1):
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1, BATCH_RETRY_DELAY))
+        for start in range(0, len(pending), MAX_BATCH_SIZE):
+            indices = pending[start:start + MAX_BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=callback)
+            for index in indices:
+                batch.add(service.events().insert(calendarId="primary", body=validated[index][0]), request_id=str(index))
             
+            try:
+                batch.execute()
             except Exception as e:
-                logging.error(f"Unexpected error in attempt {retry_count}: {str(e)}")
-                retry_count += 1
-                if retry_count >= max_retries:
-                    break
-                time.sleep(1)
+                # The whole batch failed to send, so its unresolved parts are
+                # retried like failed parts, short of auth and client errors
+                unresolved = [index for index in indices if results[index] is None and index not in retry]
+                if attempt < API_NUM_RETRIES and _is_transient_batch_error(e):
+                    logger.warning("Error executing event batch, retrying: %s", e)
+                    retry.extend(unresolved)
+                    continue
+                logger.error("Unexpected error executing event batch: %s", e)
+                if _is_auth_error(e):
+                    clear_service_cache(service)
+                for index in unresolved:
+                    results[index] = {
+                        "success": False,
+                        "error": f"Unexpected error: {str(e)}",
+                        "warnings": validated[index][1] if validated[index][1] else None
+                    }
+        
+        if not retry:
+            break
+        pending = sorted(retry)
+        retry.clear()
     
+    # The cached upcoming events list is stale now
+    if any(result["success"] for result in results):
+        _fetch_upcoming_events_raw.clear()
+    
+    return results
+
+def _event_created_result(event: Dict, parsing_errors: List[str]) -> Dict:
+    """Builds the success result for a created event, including any parsing warnings."""
+    result = {
+        "success": True,
+        "event_id": event.get('id'),
+        "link": event.get('htmlLink')
+    }
+    
+    if parsing_errors:
+        result["warnings"] = parsing_errors
+        result["message"] = "Event created with some time parsing issues. Default times were used."
+    
+    return result
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_upcoming_events_raw(_service, session_key: str, now_iso: str) -> Dict:
+    """
+    Fetch the next 10 events starting from now_iso, reusing the result for a minute.
+    ``_service`` is not hashed, so the cache is keyed on the session's cache_key
+    and the time.
+    Errors are raised rather than returned so they are never cached.
+    """
+    return (
+        _service.events()
+        .list(
+            calendarId="primary",
+            timeMin=now_iso,
+            maxResults=10,
+            singleEvents=True,
+            orderBy="startTime",
+        )
+        .execute(num_retries=API_NUM_RETRIES)
+    )
+
+def list_upcoming_events(service) -> Dict:
+    """Lists the next 10 upcoming events with timeout handling."""
+    # Rounded down to the minute so reruns within the same minute share a cached fetch
+    now = dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:00Z")
+    entry = st.session_state.get(_SERVICE_STATE_KEY)
+    session_key = entry["cache_key"] if entry and entry["service"] is service else str(id(service))
+    
+    try:
+        events_result = _fetch_upcoming_events_raw(service, session_key, now)
+    except HttpError as error:
+        logger.error("HTTP error while fetching events: %s", error)
+        if _is_auth_error(error):
+            clear_service_cache(service)
+        if "timed out" in str(error).lower():
+            return {
+                "success": False, 
+                "error": "The request to fetch calendar events timed out. Please try again later."
+            }
+        return {"success": False, "error": str(error)}
     except Exception as e:
-        logging.error(f"Unexpected error listing events: {str(e)}")
+        logger.error("Unexpected error listing events: %s", e)
+        if _is_auth_error(e):
+            clear_service_cache(service)
         return {"success": False, "error": f"Unexpected error: {str(e)}"}
+    
+    events = events_result.get("items", [])
+    events_list = []
+    
+    if not events:
+        return {"success": True, "events": [], "message": "No upcoming events found."}
+    
+    for event in events:
+        start = event["start"].get("dateTime", event["start"].get("date"))
+        try:
+            # Format the date nicely if possible
+            start_dt = _fast_google_iso(start) or dt.datetime.fromisoformat(start.replace('Z', '+00:00'))
+            if 'T' in start:  # If it includes time
+                formatted_start = f"{start_dt:{UPCOMING_TIME_FORMAT}}"
+            else:  # All-day event
+                formatted_start = f"{start_dt:{UPCOMING_DATE_FORMAT}}"
+        except:
+            formatted_start = start  # Use original if parsing fails
+            
+        events_list.append(f"🕒 {formatted_start} - {event['summary']}")
+    
+    return {"success": True, "events": events_list}
 
 def format_event_time_indian(event_data: Dict) -> Dict:
     """
     Ensures all event times are properly formatted for Indian timezone.
     Use this function before sending event data to create_calendar_event.
+    The event is updated in place and returned.
     """
-    event_copy = event_data.copy()
+    event_copy = event_data
+    fallback_iso = _fallback_times(dt.datetime.now())
     
     # Format start and end times for Indian timezone
     for time_field in ['start', 'end']:
@@ -395,20 +613,14 @@ def format_event_time_indian(event_data: Dict) -> Dict:
                         parsed_dt = parse_datetime(date_str)
                         if parsed_dt:
                             # Format with IST timezone offset
-                            event_copy[time_field]['dateTime'] = parsed_dt.strftime('%Y-%m-%dT%H:%M:%S') + DEFAULT_TIMEZONE_OFFSET
+                            event_copy[time_field]['dateTime'] = f"{parsed_dt:%Y-%m-%dT%H:%M:%S}{DEFAULT_TIMEZONE_OFFSET}"
                     except:
                         # If parsing fails, use current time + offset
-                        now = dt.datetime.now()
-                        offset = 1 if time_field == 'start' else 2
-                        future_time = now + dt.timedelta(hours=offset)
-                        event_copy[time_field]['dateTime'] = future_time.strftime('%Y-%m-%dT%H:%M:%S') + DEFAULT_TIMEZONE_OFFSET
+                        event_copy[time_field]['dateTime'] = fallback_iso[time_field]
             else:
                 # If the time field is not a dict, create a proper structure
-                now = dt.datetime.now()
-                offset = 1 if time_field == 'start' else 2
-                future_time = now + dt.timedelta(hours=offset)
                 event_copy[time_field] = {
-                    'dateTime': future_time.strftime('%Y-%m-%dT%H:%M:%S') + DEFAULT_TIMEZONE_OFFSET,
+                    'dateTime': fallback_iso[time_field],
                     'timeZone': DEFAULT_TIMEZONE
                 }
     
@@ -0,0 +1,163 @@
+# core.py
+# Streamlit-free helpers behind app.py: prompt construction, LLM reply parsing
+# and validation, and event formatting.
+import datetime as dt
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from llm_utils import extract_json_from_text
+
+# Timezone of the machine running the app, resolved once at import
+LOCAL_TZ = dt.datetime.now().astimezone().tzinfo
+
+# Kept byte-identical across requests so the provider can reuse its prompt
+# cache; the per-request date context goes in a separate message.
+SYSTEM_PROMPT = """You are a helpful calendar assistant.
+
+Extract event details from the user's input and provide them in a valid JSON format that matches Google Calendar's event format. Include the following fields when possible:
+- summary: Event title
+- location: Event location
+- description: Event description
+- start: Object with dateTime (in ISO format with timezone, e.g. "2025-03-15T09:00:00+05:30") and timeZone
+- end: Object with dateTime and timeZone 
+- colorId: A number from 1-11 representing the event color
+- attendees: Array of objects with email addresses
+- recurrence: Array of RRULE strings if the event repeats
+
+When user mentions relative dates like "today", "tomorrow", "next week", etc., convert them to actual dates based on the current date you are given.
+
+If the user describes more than one event, respond with {"events": [...]} holding one such object per event.
+
+Only include fields that are specifically mentioned by the user. Format dates correctly in ISO format with timezone.
+If you cannot determine the date or time information from the user's input, include an "error" field with value "incomplete_time_info" in your JSON response.
+
+Respond only with the JSON object and no additional text."""
+
+DATE_CONTEXT_TEMPLATE = "Today's date is {current_date} and the current time is {current_time} in timezone {current_timezone}."
+
+# Prompts with none of these hints can't describe an event, so they are
+# answered locally instead of going to the LLM
+GREETING_RE = re.compile(r'^\s*(hi|hello|hey|thanks|thank you|bye|help)\b', re.I)
+EVENT_HINT_RE = re.compile(
+    r'\d|\b(?:today|tonight|tomorrow|next|date|time|am|pm|noon|midnight|at|on'
+    r'|meeting|meet|call|schedule|appointment|event|remind(?:er)?'
+    r'|monday|tuesday|wednesday|thursday|friday|saturday|sunday'
+    r'|jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+    r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b',
+    re.I,
+)
+# Prompts that may be timed relative to the current clock. Any mention of a
+# minute or hour unit counts, however the amount is phrased ("in two hours",
+# "after 1.5hrs", "within the hour"), since spelled-out numbers are common in
+# voice transcripts
+RELATIVE_TIME_RE = re.compile(r'(?<![a-z])(?:min(?:ute)?s?|h(?:ou)?rs?|now|later|soon|ago)\b', re.I)
+HELP_MESSAGE = "👋 Hi! Tell me about an event to schedule, for example: \"Team meeting tomorrow at 3 PM in the conference room\"."
+CLARIFY_MESSAGE = "🤔 I couldn't find an event in that. Please include what the event is and when it happens, e.g. \"Call with Alex on Friday at 10 AM\"."
+
+# Shared default for .get() lookups on nested event objects; never mutated
+_EMPTY: dict = {}
+
+INCOMPLETE_TIME_MESSAGE = "❌ Not able to get the time or details are incomplete. Please provide more specific date and time information."
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a user prompt so case and spacing differences share a cache key."""
+    return " ".join(prompt.lower().split())
+
+
+def llm_cache_key(prompt: str, current_date: str, current_time: str) -> Tuple[str, ...]:
+    """
+    Cache key for the LLM reply to a prompt. Includes the date so "tomorrow" keeps
+    resolving to the right day, and the minute for prompts timed relative to now.
+    """
+    key = (normalize_prompt(prompt), current_date)
+    if RELATIVE_TIME_RE.search(prompt):
+        key += (current_time[:5],)
+    return key
+
+
+def local_reply(prompt: str) -> Optional[str]:
+    """
+    Return a canned reply for greetings and prompts without any date, time or
+    event words, or None if the prompt should go to the LLM.
+    """
+    if EVENT_HINT_RE.search(prompt):
+        return None
+    return HELP_MESSAGE if GREETING_RE.match(prompt) else CLARIFY_MESSAGE
+
+
+def build_api_messages(user_prompt: str, current_date: str, current_time: str) -> List[Dict]:
+    """Build the chat messages for the LLM: the static system prompt, the date context, then the user's prompt."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": DATE_CONTEXT_TEMPLATE.format(
+            current_date=current_date,
+            current_time=current_time,
+            current_timezone=LOCAL_TZ,
+        )},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def parse_llm_response(content: str) -> Tuple[Any, bool]:
+    """
+    Parse the LLM's reply, tolerating a surrounding markdown code fence.
+    Returns (event_json, extracted) where extracted is True if the JSON had to be
+    recovered from surrounding text; event_json is None if nothing was recovered.
+    """
+    text = content.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    try:
+        return orjson.loads(text), False
+    except orjson.JSONDecodeError:
+        return extract_json_from_text(content), True
+
+
+def split_events(event_json) -> List:
+    """Return the events in a parsed reply: the "events" array of a multi-event reply, else the reply itself."""
+    if isinstance(event_json, dict) and isinstance(event_json.get("events"), list):
+        return event_json["events"]
+    return [event_json]
+
+
+def validate_event(event_json) -> bool:
+    """
+    Check the parsed reply has the shape of a schedulable event: an object with no
+    incomplete_time_info flag, a start object carrying a dateTime, an end object
+    if present, and an attendees list of email strings or objects if present.
+    """
+    if not isinstance(event_json, dict) or event_json.get("error") == "incomplete_time_info":
+        return False
+    start = event_json.get('start')
+    return (
+        isinstance(start, dict)
+        and bool(start.get('dateTime'))
+        and isinstance(event_json.get('end', _EMPTY), dict)
+        and ('attendees' not in event_json or (
+            isinstance(event_json['attendees'], list)
+            and all(isinstance(attendee, (str, dict)) for attendee in event_json['attendees'])
+        ))
+    )
+
+
+def format_event_details(event_json: dict, link: str = None, include_desc: bool = True) -> str:
+    """Build the markdown summary of an event used in previews and confirmations."""
+    start = event_json.get('start', _EMPTY).get('dateTime')
+    end = event_json.get('end', _EMPTY).get('dateTime')
+    lines = [
+        f"📌 **Title:** {event_json.get('summary')}",
+        f"🕒 **When:** {start} to {end}",
+        f"📍 **Where:** {event_json.get('location', 'No location specified')}",
+    ]
+    if include_desc:
+        lines.append(f"📝 **Description:** {event_json.get('description', 'No description')}")
+    if 'attendees' in event_json:
+        # Plain email strings are accepted too; validate_event_data wraps them later
+        emails = (a if isinstance(a, str) else str(a.get('email', '')) for a in event_json['attendees'])
+        lines.append("👥 **Attendees:** " + ", ".join(emails))
+    if link:
+        lines.append(f"🔗 **Calendar Link:** {link}")
+    
+    # A trailing double space is a markdown line break, keeping one field per line
+    return "  \n".join(lines)
@@ -1,42 +1,63 @@
 import subprocess
 import sys
-import importlib
+import functools
+import importlib.util
 import logging
+from pathlib import Path
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# pip package name -> module it installs
+REQUIRED_PACKAGES = {
+    'google-api-python-client': 'googleapiclient',
+    'google-auth': 'google.auth',
+    'google-auth-httplib2': 'google_auth_httplib2',
+    'google-auth-oauthlib': 'google_auth_oauthlib',
+    'groq': 'groq',
+}
+
+# Written once every package is present; holds the checked package list so
+# adding a requirement triggers a fresh check
+DEPS_SENTINEL = Path(__file__).resolve().parent / ".deps_ok"
+
+def _is_installed(module_name: str) -> bool:
+    """Whether a module can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except ImportError:
+        # The parent package of a dotted name is missing
+        return False
+
+@functools.lru_cache(maxsize=1)
 def check_and_install_dependencies():
-    """Check for required dependencies and install them if missing."""
-    required_packages = [
-        'google-api-python-client',
-        'google-auth',
-        'google-auth-httplib2',
-        'google-auth-oauthlib',
-        'pytz',
-        'groq'
-    ]
+    """Check for required dependencies and install them if missing. Runs at most once per process."""
+    sentinel_text = "\n".join(REQUIRED_PACKAGES)
+    try:
+        if DEPS_SENTINEL.read_text() == sentinel_text:
+            return True
+    except OSError:
+        pass
     
     missing_packages = []
     
-    for package in required_packages:
-        try:
-            # Try to find the package name that would be used in import statements
-            import_name = package.replace('-', '_').split('>=')[0].split('==')[0]
-            importlib.import_module(import_name.split('[')[0])
-            logger.info(f"Package {package} is already installed")
-        except ImportError:
-            logger.warning(f"Package {package} is missing, will install")
+    for package, module_name in REQUIRED_PACKAGES.items():
+        if _is_installed(module_name):
+            logger.info("Package %s is already installed", package)
+        else:
+            logger.warning("Package %s is missing, will install", package)
             missing_packages.append(package)
     
     if missing_packages:
-        logger.info(f"Installing missing packages: {', '.join(missing_packages)}")
+        logger.info("Installing missing packages: %s", ', '.join(missing_packages))
         try:
             subprocess.check_call([sys.executable, "-m", "pip", "install"] + missing_packages)
             logger.info("All missing packages installed successfully")
         except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to install packages: {e}")
+            logger.error("Failed to install packages: %s", e)
             return False
     
-    return True
\ No newline at end of file
+    try:
+        DEPS_SENTINEL.write_text(sentinel_text)
+    except OSError as e:
+        logger.warning("Could not write %s: %s", DEPS_SENTINEL, e)
+    return True
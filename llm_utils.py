@@ -1,10 +1,14 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
-import json
+import orjson
 import re
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator
 import os
+from retry_utils import backoff_delay
+
+logger = logging.getLogger(__name__)
 # import api_keys
 
 
@@ -22,7 +26,24 @@ GROQ_HEADERS = {
     "Content-Type": "application/json"
 }
 
-def query_groq(messages: List[Dict], max_tokens: int = 1024, max_retries: int = 5, retry_delay: int = 10) -> Dict:
+# Patterns used by extract_json_from_text, compiled once at import
+_CODE_BLOCK_RE = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```')
+_FIELD_RES = {
+    'summary': re.compile(r'"?summary"?\s*:\s*"([^"]*)"'),
+    'location': re.compile(r'"?location"?\s*:\s*"([^"]*)"'),
+    'description': re.compile(r'"?description"?\s*:\s*"([^"]*)"'),
+}
+_DATETIME_RE = re.compile(r'"?dateTime"?\s*:\s*"([^"]*)"')
+
+# Seconds to wait on Groq before giving up on a request
+GROQ_TIMEOUT = 30
+
+# Shared session so consecutive calls reuse the TCP/TLS connection to Groq
+_SESSION = requests.Session()
+_SESSION.headers.update(GROQ_HEADERS)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+def query_groq(messages: List[Dict], max_tokens: int = 1024, max_retries: int = 5, retry_delay: float = 0.25) -> Dict:
     """
     Query the Groq API with messages and get JSON response.
     """
@@ -36,65 +57,134 @@ def query_groq(messages: List[Dict], max_tokens: int = 1024, max_retries: int =
     
     for attempt in range(max_retries):
         try:
-            response = requests.post(GROQ_API_URL, headers=GROQ_HEADERS, json=payload)
+            started = time.monotonic()
+            response = _SESSION.post(GROQ_API_URL, json=payload, timeout=GROQ_TIMEOUT)
             if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 503:
-                logging.warning(f"Model is loading. Retrying in {retry_delay} seconds... (Attempt {attempt + 1}/{max_retries})")
-                time.sleep(retry_delay)
+                return orjson.loads(response.content)
+            elif response.status_code in (429, 503):
+                delay = backoff_delay(attempt, retry_delay, response.headers.get("Retry-After"), time.monotonic() - started)
+                logger.warning(
+                    "Groq is busy (status %s). Retrying in %.1f seconds... (Attempt %s/%s)",
+                    response.status_code, delay, attempt + 1, max_retries,
+                )
+                time.sleep(delay)
             else:
-                logging.error(f"API request failed: Status code {response.status_code}, Response: {response.text}")
+                logger.error("API request failed: Status code %s, Response: %s", response.status_code, response.text)
                 return {"error": f"API request failed with status code {response.status_code}", "details": response.text}
         except Exception as e:
-            logging.error(f"Exception during API request: {str(e)}")
+            logger.error("Exception during API request: %s", e)
             return {"error": f"An exception occurred: {str(e)}"}
     
     return {"error": "Max retries reached. Model is still loading or unavailable."}
 
+def query_groq_stream(messages: List[Dict], max_tokens: int = 1024, max_retries: int = 5, retry_delay: float = 0.25) -> Iterator[str]:
+    """
+    Query the Groq API with streaming enabled and yield content chunks as they arrive.
+    Groq's JSON mode does not support streaming, so callers parse the accumulated text.
+    Raises requests.HTTPError if the request fails.
+    """
+    payload = {
+        "model": "llama3-70b-8192",
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "stream": True
+    }
+    
+    for attempt in range(max_retries):
+        started = time.monotonic()
+        response = _SESSION.post(GROQ_API_URL, json=payload, stream=True, timeout=GROQ_TIMEOUT)
+        if response.status_code in (429, 503):
+            response.close()
+            delay = backoff_delay(attempt, retry_delay, response.headers.get("Retry-After"), time.monotonic() - started)
+            logger.warning(
+                "Groq is busy (status %s). Retrying in %.1f seconds... (Attempt %s/%s)",
+                response.status_code, delay, attempt + 1, max_retries,
+            )
+            time.sleep(delay)
+            continue
+        
+        response.raise_for_status()
+        with response:
+            # Server-sent events: one "data: {...}" line per chunk, terminated by "data: [DONE]"
+            for line in response.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[len(b"data: "):]
+                if data == b"[DONE]":
+                    return
+                content = orjson.loads(data)["choices"][0]["delta"].get("content")
+                if content:
+                    yield content
+        return
+    
+    raise RuntimeError("Max retries reached. Model is still loading or unavailable.")
+
+def json_object_end(text: str) -> Optional[int]:
+    """
+    Return the index just past the first complete top-level JSON object in text,
+    or None if no object has been closed yet. Braces inside string literals are ignored.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
 def extract_json_from_text(text: str) -> Optional[Dict]:
     """
-    Extract JSON data from text using regex.
+    Extract JSON data from text.
     Handles different patterns and formats that might be returned by LLMs.
     """
-    # Try to find JSON objects with standard regex
-    json_pattern = r'({[\s\S]*})'
-    match = re.search(json_pattern, text)
+    # Try the first brace-balanced JSON object in the text
+    json_str = _extract_json_object(text)
     
-    if match:
+    if json_str:
         try:
-            json_str = match.group(1)
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            logging.warning("Failed to parse JSON with standard regex")
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            logger.warning("Failed to parse the first balanced JSON object")
     
     # Try to find JSON objects with code block markers
-    code_block_pattern = r'```(?:json)?\s*([\s\S]*?)\s*```'
-    match = re.search(code_block_pattern, text)
+    match = _CODE_BLOCK_RE.search(text)
     
     if match:
         try:
             json_str = match.group(1)
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            logging.warning("Failed to parse JSON from code block")
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            logger.warning("Failed to parse JSON from code block")
     
     # Try to extract event data directly if in a specific format
     # Look for patterns like "summary": "Meeting"
     event_data = {}
-    field_patterns = {
-        'summary': r'"?summary"?\s*:\s*"([^"]*)"',
-        'location': r'"?location"?\s*:\s*"([^"]*)"',
-        'description': r'"?description"?\s*:\s*"([^"]*)"',
-    }
-    
-    for field, pattern in field_patterns.items():
-        match = re.search(pattern, text)
+    for field, pattern in _FIELD_RES.items():
+        match = pattern.search(text)
         if match:
             event_data[field] = match.group(1)
     
     # Look for date and time information
-    datetime_pattern = r'"?dateTime"?\s*:\s*"([^"]*)"'
-    datetime_matches = re.findall(datetime_pattern, text)
+    datetime_matches = _DATETIME_RE.findall(text)
     
     if datetime_matches and len(datetime_matches) >= 2:
         event_data['start'] = {'dateTime': datetime_matches[0], 'timeZone': 'America/Los_Angeles'}
@@ -102,12 +192,22 @@ def extract_json_from_text(text: str) -> Optional[Dict]:
     
     # If we extracted any event data fields, return them
     if event_data:
-        logging.info(f"Extracted event data using field patterns: {event_data}")
+        logger.info("Extracted event data using field patterns: %s", event_data)
         return event_data
     
-    logging.warning("Could not extract any valid JSON data from text")
+    logger.warning("Could not extract any valid JSON data from text")
     return None
 
+def _extract_json_object(text: str) -> Optional[str]:
+    """
+    Return the first complete top-level {...} object in text, or None.
+    A single linear scan, unlike a greedy regex that runs to the end and backtracks.
+    """
+    end = json_object_end(text)
+    if end is None:
+        return None
+    return text[text.find("{"):end]
+
 def normalize_datetime(date_str: str) -> str:
     """
     Normalize date/time strings to ISO format with timezone.
@@ -0,0 +1,37 @@
+# retry_utils.py
+import math
+import random
+from typing import Optional
+
+# Longest server-requested wait honoured; the caller waits on the script
+# thread behind a spinner, so a huge Retry-After must not stall the page
+MAX_RETRY_AFTER = 10.0  # seconds
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Return the Retry-After header as seconds, capped at MAX_RETRY_AFTER, or None
+    if it is missing or not a finite number.
+    Only the delta-seconds form is understood; HTTP dates are ignored.
+    """
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(seconds):
+        return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def backoff_delay(attempt: int, base_delay: float, retry_after: Optional[str] = None, elapsed: float = 0.0) -> float:
+    """
+    Seconds to wait before retry number attempt (counting from 0).
+    Exponential backoff with up to one base_delay of jitter, less the elapsed
+    time the failed attempt already took, but never shorter than the wait
+    the server asked for.
+    """
+    delay = max(base_delay * (2 ** attempt + random.random()) - elapsed, 0.0)
+    server_delay = parse_retry_after(retry_after)
+    if server_delay is not None:
+        delay = max(server_delay, delay)
+    return delay
@@ -1,21 +1,22 @@
 import streamlit as st
-import tempfile
+import io
 import os
 import logging
 import base64
-import sounddevice as sd
 import numpy as np
-import wave
+import sounddevice as sd
+import soundfile as sf
+import struct
 import threading
-import queue
+import httpx
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from groq import Groq  
 
 # Load environment variables
 load_dotenv()
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging is configured by the app, or below when run directly
 logger = logging.getLogger(__name__)
 
 # Get API key from environment variables
@@ -25,124 +26,309 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     st.error("GROQ API key not found. Please set GROQ_API_KEY in .env file.")
 
-# Initialize Groq client
-client = Groq(api_key=GROQ_API_KEY)
-
-# Global variables for recording
-audio_queue = queue.Queue()
-is_recording = False
-recording_thread = None
-recorded_file_path = None  # Store the recorded file path
+# Initialize Groq client on a pooled HTTP client so consecutive transcriptions
+# reuse the TCP/TLS connection instead of handshaking each time
+http_client = httpx.Client(
+    timeout=60.0,
+    limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=300),
+)
+client = Groq(api_key=GROQ_API_KEY, http_client=http_client)
+GROQ_BASE_URL = "https://api.groq.com"
+
+# Recording format
+SAMPLE_RATE = 16000
+CHANNELS = 1
+# Frames per callback, pinned so every block has the same size (64 ms)
+BLOCKSIZE = 1024
+
+# Whisper model used for transcription by default; turbo is the fastest at a
+# small accuracy cost, and each session can pick another in the sidebar
+TRANSCRIPTION_MODEL = os.getenv("GROQ_WHISPER_MODEL", "whisper-large-v3-turbo")
+TRANSCRIPTION_MODELS = ["whisper-large-v3-turbo", "whisper-large-v3", "distil-whisper-large-v3-en"]
+if TRANSCRIPTION_MODEL not in TRANSCRIPTION_MODELS:
+    TRANSCRIPTION_MODELS.insert(0, TRANSCRIPTION_MODEL)
+
+# Transcriptions run here so the app keeps rendering during the upload
+_TRANSCRIBE_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+# Pieces of a long recording are uploaded in parallel here. A separate pool, since
+# the transcription waiting on them already holds a _TRANSCRIBE_EXECUTOR worker
+_CHUNK_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+# Recordings longer than this are split at pauses and transcribed piece by piece
+LONG_RECORDING_SECONDS = 15
+# Pause detection: 30 ms frames whose peak stays below SILENCE_THRESHOLD,
+# for at least MIN_PAUSE_SECONDS in a row
+SPLIT_FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000
+SILENCE_THRESHOLD = 500
+MIN_PAUSE_SECONDS = 0.7
+# Pieces shorter than this are merged with the next one
+MIN_CHUNK_SECONDS = 5
+# Leading and trailing silence is trimmed in 100 ms frames, using the same threshold
+TRIM_FRAME_SAMPLES = SAMPLE_RATE // 10
+# How often the page checks whether a transcription has finished
+TRANSCRIBE_POLL_INTERVAL = 0.25  # seconds
+
+# Global variables for recording. The callback fills preallocated PCM
+# segments; PortAudio calls it on its own thread, and the stream is stopped
+# before the segments are read, so the two never overlap.
+# Set while recording; an Event rather than a bare bool so the flag is shared
+# safely between the audio thread and the script thread
+_recording = threading.Event()
+recorded_audio = None  # WAV bytes of the last recording
+_stream = None
+
+# Recorded samples go into fixed ~5 s int16 segments rather than a growing
+# buffer, so the callback never reallocates and copies what it already holds.
+# PREALLOCATED_SEGMENTS are ready up front and reused by every recording;
+# longer recordings add more as they go, and those are freed once it ends.
+# A whole number of blocks, so each block lands in a single segment
+SEGMENT_SAMPLES = BLOCKSIZE * CHANNELS * 80
+PREALLOCATED_SEGMENTS = 2
+_segments = [np.empty(SEGMENT_SAMPLES, dtype=np.int16) for _ in range(PREALLOCATED_SEGMENTS)]
+_segment_index = 0  # segment being filled
+_segment_fill = 0  # samples written to it
+
+# Canonical 44-byte RIFF/WAVE header for 16-bit PCM
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+
+def _wav_header(data_size):
+    """Build the WAV header for data_size bytes of PCM in the recording format"""
+    block_align = CHANNELS * 2  # 16-bit audio
+    return WAV_HEADER.pack(
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, CHANNELS, SAMPLE_RATE, SAMPLE_RATE * block_align, block_align, 16,
+        b'data', data_size,
+    )
 
 
 def audio_callback(indata, frames, time, status):
-    """Callback function for recording audio"""
+    """Callback function for recording audio: copies each int16 block into the segments"""
+    global _segment_index, _segment_fill
     if status:
-        print(status, file=sys.stderr)
-    audio_queue.put(indata.copy())
+        logger.warning("Audio input status: %s", status)
+    if not _recording.is_set():
+        # Stop was requested; drop blocks still in flight
+        return
+
+    # PortAudio already delivers 16-bit PCM, so samples are copied as is
+    samples = indata.reshape(-1)
+    copied = 0
+    while copied < len(samples):
+        if _segment_fill == SEGMENT_SAMPLES:
+            _segment_index += 1
+            _segment_fill = 0
+            if _segment_index == len(_segments):
+                _segments.append(np.empty(SEGMENT_SAMPLES, dtype=np.int16))
+        count = min(len(samples) - copied, SEGMENT_SAMPLES - _segment_fill)
+        _segments[_segment_index][_segment_fill:_segment_fill + count] = samples[copied:copied + count]
+        _segment_fill += count
+        copied += count
 
 
 def start_recording():
-    """Start recording audio in a separate thread"""
-    global is_recording, recording_thread, audio_queue, recorded_file_path
-
-    # Clear the queue
-    while not audio_queue.empty():
-        audio_queue.get()
-
-    is_recording = True
-
-    def record_audio():
-        """Record audio and save to a temporary file"""
-        print("Recording started...")
-        sample_rate = 16000
-        channels = 1
-
-        try:
-            with sd.InputStream(samplerate=sample_rate, channels=channels, callback=audio_callback):
-                # Create temporary file for saving the audio
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-                temp_filepath = temp_file.name
-                temp_file.close()
-
-                # Setup the WAV file
-                with wave.open(temp_filepath, 'wb') as wf:
-                    wf.setnchannels(channels)
-                    wf.setsampwidth(2)  # 16-bit audio
-                    wf.setframerate(sample_rate)
-
-                    print(f"Saving audio to {temp_filepath}")
-
-                    # Record until stopped
-                    while is_recording:
-                        try:
-                            data = audio_queue.get(timeout=0.1)
-                            wf.writeframes((data * 32767).astype(np.int16).tobytes())
-                        except queue.Empty:
-                            continue
-
-                # Save the file path for later access
-                global recorded_file_path
-                recorded_file_path = temp_filepath
-
-        except Exception as e:
-            logger.error(f"Error recording audio: {str(e)}")
-            print(f"Error recording audio: {str(e)}")
-            recorded_file_path = None
-
-    # Start recording in a separate thread
-    recording_thread = threading.Thread(target=record_audio)
-    recording_thread.start()
+    """Start recording audio into the PCM segments"""
+    global recorded_audio, _stream, _segment_index, _segment_fill
 
+    print("Recording started...")
+
+    try:
+        recorded_audio = None
+        del _segments[PREALLOCATED_SEGMENTS:]
+        _segment_index = 0
+        _segment_fill = 0
+
+        _recording.set()
+        _stream = sd.InputStream(
+            samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='int16', blocksize=BLOCKSIZE, callback=audio_callback
+        )
+        _stream.start()
+
+    except Exception as e:
+        logger.error("Error recording audio: %s", e)
+        print(f"Error recording audio: {str(e)}")
+        _recording.clear()
+        _close_recording()
+
+
+def _close_recording():
+    """Stop the input stream, then assemble the segments into an in-memory WAV file"""
+    global _stream, recorded_audio
+    if _stream is None:
+        return
+    _stream.stop()
+    _stream.close()
+    _stream = None
+
+    # Clips are small, so the WAV file never touches the disk
+    pieces = [memoryview(segment) for segment in _segments[:_segment_index]]
+    pieces.append(memoryview(_segments[_segment_index][:_segment_fill]))
+    data_size = sum(piece.nbytes for piece in pieces)
+    recorded_audio = b"".join([_wav_header(data_size), *pieces])
+    # The WAV holds its own copy, so a long recording's extra segments can go
+    del pieces
+    del _segments[PREALLOCATED_SEGMENTS:]
 
-def stop_recording():
-    """Stop the recording and return the path to the recorded file"""
-    global is_recording, recording_thread, recorded_file_path
 
-    if not is_recording:
+def stop_recording():
+    """Stop the recording and return (wav_bytes, sample_rate), or None if not recording"""
+    if not _recording.is_set():
         return None
 
-    is_recording = False
+    _recording.clear()
 
-    # Wait for recording thread to finish
-    if recording_thread:
-        print("Stopping recording...")
-        recording_thread.join()
-        temp_filepath = recorded_file_path
-        recording_thread = None  # Reset thread variable
+    print("Stopping recording...")
+    _close_recording()
+    return recorded_audio, SAMPLE_RATE
 
-        return temp_filepath
 
-    return None
+def _encode_flac(wav_bytes):
+    """Re-encode the recorded WAV as lossless FLAC, roughly half the upload size for speech"""
+    samples, sample_rate = sf.read(io.BytesIO(wav_bytes), dtype='int16')
+    flac = io.BytesIO()
+    sf.write(flac, samples, sample_rate, format='FLAC', subtype='PCM_16')
+    # Hand back the buffer itself; httpx streams the multipart body from it,
+    # and rewinds it if the SDK retries, so no extra bytes copy is made
+    flac.seek(0)
+    return flac
 
 
-def transcribe_with_groq(audio_file_path):
+def transcribe_with_groq(wav_bytes, model=TRANSCRIPTION_MODEL):
     """
     Transcribe audio using Groq's Whisper API
     
     Args:
-        audio_file_path (str): Path to the audio file
+        wav_bytes (bytes): WAV file contents
+        model (str): Whisper model to use
         
     Returns:
         str: Transcribed text
+    
+    Raises the Groq API error if the request fails. Runs on a worker
+    thread, so it must not draw Streamlit elements.
     """
     if not GROQ_API_KEY:
         raise ValueError("GROQ_API_KEY_Whisper not found in environment variables")
 
     try:
-        with open(audio_file_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(audio_file_path, file.read()),
-                model="whisper-large-v3",
-                response_format="verbose_json"
-            )
-
-            print(f"Transcription received: {transcription.text}")
-            return transcription.text
+        chunks = _split_at_pauses(_trim_silence(wav_bytes))
+        if len(chunks) == 1:
+            text = _transcribe_cached(chunks[0], model)
+        else:
+            # Transcribe the pieces concurrently and put the text back in order
+            texts = _CHUNK_EXECUTOR.map(_transcribe_cached, chunks, [model] * len(chunks))
+            text = " ".join(t for t in texts if t)
+        print(f"Transcription received: {text}")
+        return text
+    except Exception as e:
+        logger.error("Error with Groq API: %s", e)
+        raise
+
+
+def _trim_silence(wav_bytes):
+    """
+    Drop the silence before the first and after the last frame of speech, so it
+    is neither uploaded nor transcribed. Recordings with no speech come back whole.
+    """
+    pcm = np.frombuffer(wav_bytes, dtype=np.int16, offset=WAV_HEADER.size)
+    frame_count = len(pcm) // TRIM_FRAME_SAMPLES
+    frames = pcm[:frame_count * TRIM_FRAME_SAMPLES].reshape(frame_count, TRIM_FRAME_SAMPLES)
+    loud = np.flatnonzero((frames.max(axis=1) >= SILENCE_THRESHOLD) | (frames.min(axis=1) <= -SILENCE_THRESHOLD))
+    if not len(loud):
+        return wav_bytes
+
+    start = loud[0] * TRIM_FRAME_SAMPLES
+    # Keep the partial frame at the end if speech runs up to it
+    end = len(pcm) if loud[-1] == frame_count - 1 else (loud[-1] + 1) * TRIM_FRAME_SAMPLES
+    if start == 0 and end == len(pcm):
+        return wav_bytes
+    trimmed = pcm[start:end].tobytes()
+    return _wav_header(len(trimmed)) + trimmed
+
+
+def _split_at_pauses(wav_bytes):
+    """
+    Split a long recording at pauses in speech, returning a list of WAV files.
+    Short recordings, or long ones without a usable pause, come back whole.
+    """
+    pcm = np.frombuffer(wav_bytes, dtype=np.int16, offset=WAV_HEADER.size)
+    if len(pcm) <= LONG_RECORDING_SECONDS * SAMPLE_RATE:
+        return [wav_bytes]
+
+    frame_count = len(pcm) // SPLIT_FRAME_SAMPLES
+    frames = pcm[:frame_count * SPLIT_FRAME_SAMPLES].reshape(frame_count, SPLIT_FRAME_SAMPLES)
+    # Comparing max and min avoids np.abs overflowing on -32768
+    silent = (frames.max(axis=1) < SILENCE_THRESHOLD) & (frames.min(axis=1) > -SILENCE_THRESHOLD)
+
+    # Start and end frame of each run of silent frames
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    min_pause_frames = MIN_PAUSE_SECONDS * SAMPLE_RATE / SPLIT_FRAME_SAMPLES
+    min_chunk_samples = MIN_CHUNK_SECONDS * SAMPLE_RATE
+
+    # Cut in the middle of every long enough pause, skipping cuts that would
+    # leave a piece shorter than MIN_CHUNK_SECONDS
+    cuts = [0]
+    for run_start, run_end in zip(edges[::2], edges[1::2]):
+        if run_end - run_start < min_pause_frames:
+            continue
+        cut = (run_start + run_end) // 2 * SPLIT_FRAME_SAMPLES
+        if cut - cuts[-1] >= min_chunk_samples and len(pcm) - cut >= min_chunk_samples:
+            cuts.append(cut)
+    cuts.append(len(pcm))
+
+    chunks = []
+    for start, end in zip(cuts, cuts[1:]):
+        piece = pcm[start:end].tobytes()
+        chunks.append(_wav_header(len(piece)) + piece)
+    return chunks
+
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def _transcribe_cached(wav_bytes, model):
+    """
+    Transcribe WAV bytes with the given model, reusing the result for identical audio.
+    Errors are raised, so they are never cached.
+    """
+    # Plain text is the smallest response and the only part used. Switch to
+    # verbose_json (and read .text and .segments) if timings are ever needed
+    transcription = client.audio.transcriptions.create(
+        file=("audio.flac", _encode_flac(wav_bytes)),
+        model=model,
+        response_format="text"
+    )
+    # The SDK returns the body as a str for the text format
+    return transcription.strip()
+
+
+def _warm_up_connection():
+    """Open a pooled connection to Groq ahead of the first upload; failures are harmless."""
+    try:
+        http_client.head(GROQ_BASE_URL)
+    except httpx.HTTPError as e:
+        logger.info("Groq connection warmup failed: %s", e)
+
+
+@st.fragment(run_every=TRANSCRIBE_POLL_INTERVAL)
+def _poll_transcription():
+    """Show progress for the background transcription and rerun the app once it finishes."""
+    if st.session_state.transcription.done():
+        st.rerun()
+    st.info("📝 Transcribing...")
+
+
+def _collect_transcription():
+    """Store the result of a finished background transcription, or report its error."""
+    future = st.session_state.pop('transcription')
+    try:
+        transcribed_text = future.result()
     except Exception as e:
-        logger.error(f"Error with Groq API: {str(e)}")
         st.error(f"Error transcribing audio: {str(e)}")
-        return None
+        return
+
+    if transcribed_text:
+        st.session_state.transcribed_text = transcribed_text
+    else:
+        st.error("Failed to transcribe audio.")
 
 
 
@@ -151,6 +337,14 @@ def add_mic_to_chat_input():
     if 'recording' not in st.session_state:
         st.session_state.recording = False
         st.session_state.transcribed_text = None
+        # Do the TCP/TLS handshake now rather than after the user clicks Stop
+        _TRANSCRIBE_EXECUTOR.submit(_warm_up_connection)
+
+    # Latency vs. accuracy, chosen per session
+    st.sidebar.selectbox(
+        "Transcription model", TRANSCRIPTION_MODELS,
+        index=TRANSCRIPTION_MODELS.index(TRANSCRIPTION_MODEL), key='transcription_model',
+    )
 
     # Display appropriate button based on the recording state
     if not st.session_state.recording:
@@ -161,18 +355,28 @@ def add_mic_to_chat_input():
     else:
         if st.button("⏹️ Stop Recording"):
             st.session_state.recording = False
-            temp_filepath = stop_recording()
-            if temp_filepath and os.path.exists(temp_filepath):
-                with st.spinner("Transcribing..."):
-                    transcribed_text = transcribe_with_groq(temp_filepath)
+            recording = stop_recording()
+            if recording:
+                wav_bytes, _ = recording
+                # The same bytes serve playback and upload
+                st.session_state.last_recording = wav_bytes
+                # Upload in the background; the rerun renders right away
+                st.session_state.transcription = _TRANSCRIBE_EXECUTOR.submit(
+                    transcribe_with_groq, wav_bytes, st.session_state.transcription_model
+                )
+            st.rerun()
 
-                if transcribed_text:
-                    st.session_state.transcribed_text = transcribed_text
-                else:
-                    st.error("Failed to transcribe audio.")
+    # Let the user play back the last recording, as captured; the silence
+    # trim in transcribe_with_groq only applies to the upload
+    if st.session_state.get('last_recording'):
+        st.audio(st.session_state.last_recording, format='audio/wav')
 
-                os.unlink(temp_filepath)  # Clean up file
-            st.rerun()
+    # Pick up a background transcription once it is done
+    if 'transcription' in st.session_state:
+        if st.session_state.transcription.done():
+            _collect_transcription()
+        else:
+            _poll_transcription()
 
     # Display transcribed text if available
     return st.session_state.get('transcribed_text')
@@ -181,6 +385,7 @@ def add_mic_to_chat_input():
 
 # Example usage in a Streamlit app
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     st.title("🎤 AI Voice Transcription")
     transcribed_text = add_mic_to_chat_input()
     if transcribed_text: